@@ -81,9 +81,6 @@ class RRT:
                 if self.check_collision(final_node, self.obstacle_list):
                     return self.generate_final_course(len(self.node_list) - 1)
 
-            if animation and i % 5:
-                self.draw_graph(rnd_node)
-
         return None  # cannot find path
 
     def steer(self, from_node, to_node, extend_length=float("inf")):
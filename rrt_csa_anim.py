@@ -7,19 +7,206 @@ author: AtsushiSakai(@Atsushi_twi)
 """
 
 import math
+import os
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import numpy as np
+from numba import njit, prange
+from scipy.spatial import cKDTree
 from timeit import default_timer as timer
 
 show_animation = True
 GoalBiased = True
 InflationRadius = 0.8
 
+# one worker thread shared by every RRT instance for kd-tree rebuilds; it
+# starts on first use and is joined at interpreter exit
+_rebuild_executor = ThreadPoolExecutor(max_workers=1)
+
 def EuclideanDistanceOfNodes(start, end):
     return math.sqrt(((end.y-start.y)**2)+((end.x-start.x)**2))
 
+# ==== compiled kernels used by RRT.planning when animation is off ====
+# They mirror the RRT methods of the same name but work on plain floats
+# and arrays: float32 node positions in xs/ys, int32 parent indices in
+# parents and float32 obstacles as rows of [x, y, r, r ** 2] with
+# r = size + InflationRadius.
+
+@njit(cache=True)
+def _calc_distance_and_direction(from_x, from_y, to_x, to_y):
+    dx = to_x - from_x
+    dy = to_y - from_y
+    d = math.hypot(dx, dy)
+    if d == 0.0:
+        return d, 0.0, 0.0
+    return d, dx / d, dy / d
+
+
+@njit(cache=True)
+def _steer(from_x, from_y, to_x, to_y, extend_length, path_resolution, path_x, path_y):
+    """
+    fills path_x/path_y with the expanded path, returns (x, y, n_points)
+    """
+    d, ux, uy = _calc_distance_and_direction(from_x, from_y, to_x, to_y)
+
+    path_x[0] = from_x
+    path_y[0] = from_y
+
+    if extend_length > d:
+        extend_length = d
+
+    n_expand = int(math.floor(extend_length / path_resolution))
+
+    dx = path_resolution * ux
+    dy = path_resolution * uy
+    for k in range(1, n_expand + 1):
+        path_x[k] = from_x + k * dx
+        path_y[k] = from_y + k * dy
+    n_points = n_expand + 1
+    x, y = path_x[n_expand], path_y[n_expand]
+
+    # the path heads straight at to_x/to_y, so the distance left is known
+    if d - n_expand * path_resolution <= path_resolution:
+        path_x[n_points] = to_x
+        path_y[n_points] = to_y
+        n_points += 1
+
+    return x, y, n_points
+
+
+@njit(cache=True)
+def _check_collision(path_x, path_y, n_points, obstacles):
+    # every path point lies within half_len of the segment midpoint
+    mx = 0.5 * (path_x[0] + path_x[n_points - 1])
+    my = 0.5 * (path_y[0] + path_y[n_points - 1])
+    half_len = 0.5 * math.hypot(path_x[n_points - 1] - path_x[0],
+                                path_y[n_points - 1] - path_y[0])
+    for j in range(obstacles.shape[0]):
+        ox, oy, r, r2 = obstacles[j, 0], obstacles[j, 1], obstacles[j, 2], obstacles[j, 3]
+        if (ox - mx) ** 2 + (oy - my) ** 2 > (half_len + r) ** 2:
+            continue  # too far from the segment to touch it
+        for k in range(n_points):
+            dx = ox - path_x[k]
+            dy = oy - path_y[k]
+            if dx * dx + dy * dy <= r2:
+                return False  # collision
+
+    return True  # safe
+
+
+@njit(cache=True)
+def _get_nearest_node_index(xs, ys, n, rnd_x, rnd_y):
+    minind = 0
+    mind2 = np.inf
+    for k in range(n):
+        d2 = (xs[k] - rnd_x) ** 2 + (ys[k] - rnd_y) ** 2
+        if d2 < mind2:
+            minind = k
+            mind2 = d2
+
+    return minind
+
+
+@njit(cache=True)
+def _planning(start_x, start_y, end_x, end_y, min_rand, max_rand,
+              expand_dis, path_resolution, goal_sample_rate, goal_biased,
+              max_iter, expansion_step, obstacles, seed, stop, xs, ys, parents):
+    """
+    grows the tree into xs/ys/parents, returns (found, n, sampling_radius)
+
+    xs, ys, parents: output buffers of at least max_iter + 1 entries, the
+    most nodes one run can add
+    stop: shared one-element flag; set on success, and the search gives up
+    as soon as another run has set it
+    """
+    np.random.seed(seed)
+
+    xs[0] = start_x
+    ys[0] = start_y
+    parents[0] = -1
+    n = 1
+
+    max_points = int(math.floor(expand_dis / path_resolution)) + 3
+    path_x = np.empty(max_points, dtype=np.float32)
+    path_y = np.empty(max_points, dtype=np.float32)
+
+    sampling_radius = math.hypot(end_x - start_x, end_y - start_y)
+    sampling_r2 = sampling_radius * sampling_radius
+    for i in range(max_iter):
+        if stop[0]:
+            break
+        if goal_biased and np.random.randint(0, 101) <= goal_sample_rate:
+            rnd_x, rnd_y = end_x, end_y  # goal point sampling
+        else:
+            rnd_x = np.random.uniform(min_rand, max_rand)
+            rnd_y = np.random.uniform(min_rand, max_rand)
+        dx = end_x - rnd_x
+        dy = end_y - rnd_y
+        if dx * dx + dy * dy > sampling_r2:
+            continue
+        nearest_ind = _get_nearest_node_index(xs, ys, n, rnd_x, rnd_y)
+
+        new_x, new_y, n_points = _steer(xs[nearest_ind], ys[nearest_ind], rnd_x, rnd_y,
+                                        expand_dis, path_resolution, path_x, path_y)
+
+        if not _check_collision(path_x, path_y, n_points, obstacles):
+            sampling_radius = sampling_radius + expansion_step
+            sampling_r2 = sampling_radius * sampling_radius
+            continue
+
+        xs[n] = new_x
+        ys[n] = new_y
+        parents[n] = nearest_ind
+        n += 1
+        dx = new_x - end_x
+        dy = new_y - end_y
+        sampling_r2 = dx * dx + dy * dy
+        sampling_radius = math.sqrt(sampling_r2)
+
+        if sampling_radius <= expand_dis:
+            _, _, n_points = _steer(new_x, new_y, end_x, end_y,
+                                    expand_dis, path_resolution, path_x, path_y)
+            if _check_collision(path_x, path_y, n_points, obstacles):
+                stop[0] = True
+                return True, n, sampling_radius
+
+    return False, n, sampling_radius  # cannot find path
+
+
+@njit(parallel=True, cache=True)
+def _planning_seeds(start_x, start_y, end_x, end_y, min_rand, max_rand,
+                    expand_dis, path_resolution, goal_sample_rate, goal_biased,
+                    max_iter, expansion_step, obstacles, seeds, xs, ys, parents):
+    """
+    grows one independent tree per seed in parallel, seed s into row s of
+    the (len(seeds), max_iter + 1) buffers xs/ys/parents
+
+    returns (winner, n, sampling_radius) with n and sampling_radius per
+    seed; winner is the index of a seed that reached the goal, or -1
+    """
+    found = np.zeros(len(seeds), dtype=np.bool_)
+    n = np.zeros(len(seeds), dtype=np.int64)
+    sampling_radius = np.zeros(len(seeds))
+    stop = np.zeros(1, dtype=np.bool_)
+    for s in prange(len(seeds)):
+        found[s], n[s], sampling_radius[s] = _planning(
+            start_x, start_y, end_x, end_y, min_rand, max_rand,
+            expand_dis, path_resolution, goal_sample_rate, goal_biased,
+            max_iter, expansion_step, obstacles, seeds[s], stop,
+            xs[s], ys[s], parents[s])
+
+    winner = -1
+    for s in range(len(seeds)):
+        if found[s]:
+            winner = s
+            break
+    return winner, n, sampling_radius
+
+
 class RRT:
     """
     Class for RRT planning
@@ -57,71 +244,209 @@ class RRT:
         self.goal_sample_rate = goal_sample_rate
         self.max_iter = max_iter
         self.obstacle_list = obstacle_list
+        self._obstacles = np.array([(ox, oy, size + InflationRadius, (size + InflationRadius) ** 2)
+                                    for (ox, oy, size) in obstacle_list],
+                                   dtype=np.float32).reshape(-1, 4)
+        # largest first, so the compiled collision check tends to exit early
+        self._obstacles = self._obstacles[np.argsort(-self._obstacles[:, 2], kind="stable")]
+        # the same rows as Python floats for the scalar check_collision loop
+        self._obstacle_rows = [tuple(row) for row in self._obstacles.tolist()]
         self.node_list = []
         self.SamplingRadius = EuclideanDistanceOfNodes(self.start,self.end)
+        # squared sampling radius, so the rejection test needs no sqrt
+        self._sampling_r2 = self.SamplingRadius ** 2
         self.ExpansionCoeff = 2
         self.ExpansionEps = 0.3
-
-    def planning(self, animation=True):
+        # nearest-node index: kd-tree over the first _indexed_n nodes,
+        # brute-force scan over the tail appended since the last rebuild.
+        # Rebuilds run on a worker thread; _rebuild holds (future, n) until
+        # the new tree is swapped in
+        self.rebuild_threshold = 256
+        self._rebuild = None
+        # node positions and parent indices stored as flat arrays; float32 is
+        # plenty for path_resolution-sized steps and halves the memory scanned
+        self._xs = np.empty(1024, dtype=np.float32)
+        self._ys = np.empty(1024, dtype=np.float32)
+        self._parents = np.empty(1024, dtype=np.int32)
+        self._n = 0
+        self._indexed_n = 0
+        self._kdtree = None
+        # random samples are drawn in blocks and handed out one per call;
+        # blocks start small and double up to rng_block_size, so short runs
+        # don't pay for samples they never use. Seeded from the random module
+        # so random.seed() keeps runs reproducible
+        self.rng_block_size = 8192
+        self._rng = np.random.default_rng(random.randrange(2 ** 32))
+        self._rng_x = []
+        self._rng_y = []
+        self._rng_bias = []
+        self._rng_idx = 0
+        # persistent figure and artists, built on the first draw_graph call
+        self.draw_interval = 1.0 / 30  # [s] minimum time between animation frames
+        self._last_draw = 0.0
+        self._fig = None
+        self._ax = None
+        self._rnd_marker = None
+        self._sampling_circle = None
+        self._edges = None
+        self._edge_segments = []
+
+    def planning(self, animation=True, n_seeds=1):
         """
         rrt path planning
 
         animation: flag for animation on or off
+        n_seeds: with animation off, number of trees grown in parallel; the
+        animated planner grows a single tree
         """
-        
+        if not animation:
+            return self.planning_compiled(n_seeds)
+        if n_seeds != 1:
+            raise ValueError("n_seeds only applies with animation=False")
 
+        self._fig = None  # start a fresh figure on the next draw_graph
         self.node_list = [self.start]
+        self._n = 0
+        self._indexed_n = 0
+        self._kdtree = None
+        self.cancel_rebuild()
+        self.add_node_to_index(self.start, -1)
+
+        # loop invariants and sampling state as locals; the sampling state
+        # is written back before drawing and on return
+        end = self.end
+        end_x, end_y = end.x, end.y
+        expand_dis = self.expand_dis
+        expansion_step = self.ExpansionCoeff * self.ExpansionEps
+        node_list = self.node_list
+        sampling_radius = self.SamplingRadius
+        sampling_r2 = self._sampling_r2
         for i in range(self.max_iter):
             rnd_node = self.get_random_node()
-            if EuclideanDistanceOfNodes(self.end, rnd_node) > self.SamplingRadius :
+            dx = end_x - rnd_node.x
+            dy = end_y - rnd_node.y
+            if dx * dx + dy * dy > sampling_r2:
                 continue
-            nearest_ind = self.get_nearest_node_index(self.node_list, rnd_node)
-            nearest_node = self.node_list[nearest_ind]
-
-            new_node = self.steer(nearest_node, rnd_node, self.expand_dis)
-
-            if self.check_collision(new_node, self.obstacle_list):
-                self.node_list.append(new_node)
-                self.SamplingRadius = EuclideanDistanceOfNodes(new_node, self.end)
+            nearest_ind = self.get_nearest_node_index(rnd_node)
+            nearest_node = node_list[nearest_ind]
+
+            new_node = self.steer(nearest_node, rnd_node, expand_dis)
+
+            if self.check_collision(new_node):
+                node_list.append(new_node)
+                self.add_node_to_index(new_node, nearest_ind)
+                last_node = new_node
+                dx = last_node.x - end_x
+                dy = last_node.y - end_y
+                sampling_r2 = dx * dx + dy * dy
+                sampling_radius = math.sqrt(sampling_r2)
                 dont_change_color = True
             else:
-                self.SamplingRadius = self.SamplingRadius + (self.ExpansionCoeff * self.ExpansionEps)
+                sampling_radius = sampling_radius + expansion_step
+                sampling_r2 = sampling_radius ** 2
                 continue
 
-            if animation and i % 5 == 0:
+            if animation and time.monotonic() - self._last_draw >= self.draw_interval:
+                self.SamplingRadius, self._sampling_r2 = sampling_radius, sampling_r2
                 self.draw_graph(rnd_node)
 
-            if self.calc_dist_to_goal(self.node_list[-1].x, self.node_list[-1].y) <= self.expand_dis:
-                final_node = self.steer(self.node_list[-1], self.end, self.expand_dis)
-                if self.check_collision(final_node, self.obstacle_list):
-                    return self.generate_final_course(len(self.node_list) - 1)
-
-            if animation and i % 5:
-                self.draw_graph(rnd_node)
+            # sampling_radius is already the distance from last_node to the goal
+            if sampling_radius <= expand_dis:
+                inv_d = 1.0 / sampling_radius if sampling_radius > 0.0 else 0.0
+                final_node = self.steer(last_node, end, expand_dis,
+                                        d=sampling_radius, ux=-dx * inv_d, uy=-dy * inv_d)
+                if self.check_collision(final_node):
+                    self.SamplingRadius, self._sampling_r2 = sampling_radius, sampling_r2
+                    return self.generate_final_course(len(node_list) - 1)
 
+        self.SamplingRadius, self._sampling_r2 = sampling_radius, sampling_r2
         return None  # cannot find path
 
-    def steer(self, from_node, to_node, extend_length=float("inf")):
+    def planning_compiled(self, n_seeds=1):
+        """
+        rrt path planning with the whole loop compiled by numba
 
-        new_node = self.Node(from_node.x, from_node.y)
-        d, theta = self.calc_distance_and_angle(new_node, to_node)
+        n_seeds: number of independent trees grown in parallel, the first to
+        reach the goal wins; None uses one per CPU. Every seed gets its own
+        node buffers of max_iter + 1 entries, 12 bytes each (about 1.2 MB per
+        seed at the default max_iter), so memory grows with n_seeds
 
-        new_node.path_x = [new_node.x]
-        new_node.path_y = [new_node.y]
+        seeded from the random module, so random.seed() keeps single-seed runs
+        reproducible
+        """
+        if n_seeds is None:
+            n_seeds = os.cpu_count() or 1
+        if n_seeds < 1:
+            raise ValueError("n_seeds must be at least 1")
+        args = (self.start.x, self.start.y, self.end.x, self.end.y,
+                self.min_rand, self.max_rand, self.expand_dis, self.path_resolution,
+                self.goal_sample_rate, GoalBiased, self.max_iter,
+                self.ExpansionCoeff * self.ExpansionEps, self._obstacles)
+        seeds = np.array([random.randrange(2 ** 32) for _ in range(n_seeds)], dtype=np.int64)
+
+        # one buffer row per seed, each sized for the most nodes a run can add
+        xs = np.empty((n_seeds, self.max_iter + 1), dtype=np.float32)
+        ys = np.empty((n_seeds, self.max_iter + 1), dtype=np.float32)
+        parents = np.empty((n_seeds, self.max_iter + 1), dtype=np.int32)
+        if n_seeds > 1:
+            winner, ns, radii = _planning_seeds(*args, seeds, xs, ys, parents)
+            found = winner != -1
+            # show the first seed's tree when no seed reached the goal
+            row = max(winner, 0)
+            n, self.SamplingRadius = int(ns[row]), float(radii[row])
+        else:
+            row = 0
+            found, n, self.SamplingRadius = _planning(
+                *args, seeds[0], np.zeros(1, dtype=np.bool_), xs[0], ys[0], parents[0])
+        xs, ys, parents = xs[row, :n].copy(), ys[row, :n].copy(), parents[row, :n].copy()
+        self._sampling_r2 = self.SamplingRadius ** 2
+        self._xs, self._ys, self._parents, self._n = xs, ys, parents, n
+        self._indexed_n = 0
+        self._kdtree = None
+        self.cancel_rebuild()
+        self._fig = None  # start a fresh figure on the next draw_graph
+
+        # rebuild the Node tree for draw_graph and generate_final_course
+        self.node_list = [self.start]
+        for k in range(1, n):
+            node = self.Node(float(xs[k]), float(ys[k]))
+            node.parent = self.node_list[parents[k]]
+            node.path_x = [node.parent.x, node.x]
+            node.path_y = [node.parent.y, node.y]
+            self.node_list.append(node)
+
+        if not found:
+            return None  # cannot find path
+        return self.generate_final_course(n - 1)
+
+    def steer(self, from_node, to_node, extend_length=float("inf"), d=None, ux=None, uy=None):
+        """
+        d, ux, uy: distance and unit direction from from_node to to_node, if
+        the caller already has them
+        """
+
+        new_node = self.Node(from_node.x, from_node.y)
+        if d is None or ux is None or uy is None:
+            d, ux, uy = self.calc_distance_and_direction(new_node, to_node)
 
         if extend_length > d:
             extend_length = d
 
         n_expand = math.floor(extend_length / self.path_resolution)
 
+        # the direction is fixed along the path, so step by a constant stride
+        dx = self.path_resolution * ux
+        dy = self.path_resolution * uy
+        new_node.path_x = [new_node.x]
+        new_node.path_y = [new_node.y]
         for _ in range(n_expand):
-            new_node.x += self.path_resolution * math.cos(theta)
-            new_node.y += self.path_resolution * math.sin(theta)
+            new_node.x += dx
+            new_node.y += dy
             new_node.path_x.append(new_node.x)
             new_node.path_y.append(new_node.y)
 
-        d, _ = self.calc_distance_and_angle(new_node, to_node)
-        if d <= self.path_resolution:
+        # the path heads straight at to_node, so the distance left is known
+        if d - n_expand * self.path_resolution <= self.path_resolution:
             new_node.path_x.append(to_node.x)
             new_node.path_y.append(to_node.y)
 
@@ -130,14 +455,15 @@ class RRT:
         return new_node
 
     def generate_final_course(self, goal_ind):
-        path = [[self.end.x, self.end.y]]
-        node = self.node_list[goal_ind]
-        while node.parent is not None:
-            path.append([node.x, node.y])
-            node = node.parent
-        path.append([node.x, node.y])
+        # walk the parent indices back to the start node (parent -1)
+        path_ind = []
+        ind = goal_ind
+        while ind != -1:
+            path_ind.append(ind)
+            ind = int(self._parents[ind])
+        path = np.stack((self._xs[path_ind], self._ys[path_ind]), axis=1)
 
-        return path
+        return [[self.end.x, self.end.y]] + path.tolist()
 
     def calc_dist_to_goal(self, x, y):
         dx = x - self.end.x
@@ -145,89 +471,159 @@ class RRT:
         return math.hypot(dx, dy)
 
     def get_random_node(self):
-        if GoalBiased:
-            if random.randint(0, 100) > self.goal_sample_rate:
-                rnd = self.Node(random.uniform(self.min_rand, self.max_rand),
-                                random.uniform(self.min_rand, self.max_rand))
-            else:  # goal point sampling
-                rnd = self.Node(self.end.x, self.end.y)
+        if self._rng_idx >= len(self._rng_x):
+            block_size = min(max(2 * len(self._rng_x), 256), self.rng_block_size)
+            rnd_xy = self._rng.uniform(self.min_rand, self.max_rand, (2, block_size))
+            self._rng_x = rnd_xy[0].tolist()
+            self._rng_y = rnd_xy[1].tolist()
+            self._rng_bias = self._rng.integers(0, 101, block_size).tolist()
+            self._rng_idx = 0
+        i = self._rng_idx
+        self._rng_idx += 1
+
+        if GoalBiased and self._rng_bias[i] <= self.goal_sample_rate:
+            rnd = self.Node(self.end.x, self.end.y)  # goal point sampling
         else:
-            rnd = self.Node(random.uniform(self.min_rand, self.max_rand),
-                            random.uniform(self.min_rand, self.max_rand))
+            rnd = self.Node(self._rng_x[i], self._rng_y[i])
         return rnd
 
-    def draw_graph(self, rnd=None , dont_cc = False):
-        plt.clf()
+    def init_graph(self):
+        """
+        builds the figure once; draw_graph then only updates its artists
+        """
+        self._fig = plt.gcf()
+        self._fig.clf()
+        self._ax = self._fig.gca()
         # for stopping simulation with the esc key.
-        plt.gcf().canvas.mpl_connect('key_release_event',
+        self._fig.canvas.mpl_connect('key_release_event',
                                      lambda event: [exit(0) if event.key == 'escape' else None])
-        if rnd is not None:
-            rnd_point_color = '^k'
-            if EuclideanDistanceOfNodes(self.end, rnd) > self.SamplingRadius:
-                rnd_point_color = '^r'
-            else:
-                rnd_point_color = '^g'
-            plt.plot(rnd.x, rnd.y, rnd_point_color)
 
-        for node in self.node_list:
-            if node.parent:
-                plt.plot(node.path_x, node.path_y, "-g")
+        self._rnd_marker, = self._ax.plot([], [], "^k")
+        # every tree edge lives in this one collection
+        self._edges = LineCollection([], colors="g")
+        self._ax.add_collection(self._edges)
+        self._edge_segments = []
 
-        sampling_range_circle = plt.Circle((self.end.x, self.end.y), 
+        self._sampling_circle = plt.Circle((self.end.x, self.end.y), 
                                             self.SamplingRadius, color='r' , 
                                             alpha=0.2,
                                             hatch='x',
                                             linestyle='--',
                                             facecolor='b',
                                             linewidth=3.0)
-        fig = plt.gcf()
-        ax = fig.gca()
-        ax.add_artist(sampling_range_circle)
+        self._ax.add_artist(self._sampling_circle)
 
         for (ox, oy, size) in self.obstacle_list:
             inflation_cir = plt.Circle((ox,oy), size+ InflationRadius, color='g', alpha=0.25, linewidth=0.0)
-            ax.add_artist(inflation_cir)
+            self._ax.add_artist(inflation_cir)
             obst_cir = plt.Circle((ox,oy), size, color='b', alpha=0.8 , linewidth=0.0)
-            ax.add_artist(obst_cir)
+            self._ax.add_artist(obst_cir)
 
-        plt.plot(self.start.x, self.start.y, "xr")
-        plt.plot(self.end.x, self.end.y, "xr")
-        plt.axis("equal")
-        plt.axis([self.min_rand*2, self.max_rand*2, self.min_rand*2, self.max_rand*2])
-        plt.grid(True)
-        plt.pause(0.01)
+        self._ax.plot(self.start.x, self.start.y, "xr")
+        self._ax.plot(self.end.x, self.end.y, "xr")
+        self._ax.axis("equal")
+        self._ax.axis([self.min_rand*2, self.max_rand*2, self.min_rand*2, self.max_rand*2])
+        self._ax.grid(True)
+        plt.show(block=False)
 
-    @staticmethod
-    def get_nearest_node_index(node_list, rnd_node):
-        dlist = [(node.x - rnd_node.x) ** 2 + (node.y - rnd_node.y)
-                 ** 2 for node in node_list]
-        minind = dlist.index(min(dlist))
-
-        return minind
+    def draw_graph(self, rnd=None , dont_cc = False):
+        if self._fig is None or not plt.fignum_exists(self._fig.number):
+            self.init_graph()
 
-    @staticmethod
-    def check_collision(node, obstacleList):
+        if rnd is not None:
+            dx = self.end.x - rnd.x
+            dy = self.end.y - rnd.y
+            if dx * dx + dy * dy > self._sampling_r2:
+                self._rnd_marker.set_color('r')
+            else:
+                self._rnd_marker.set_color('g')
+            self._rnd_marker.set_data([rnd.x], [rnd.y])
+        self._rnd_marker.set_visible(rnd is not None)
+
+        # append the edges added since the last frame to the single collection
+        new_nodes = self.node_list[len(self._edge_segments) + 1:]
+        if new_nodes:
+            self._edge_segments.extend(np.column_stack((node.path_x, node.path_y))
+                                       for node in new_nodes)
+            self._edges.set_segments(self._edge_segments)
+
+        self._sampling_circle.set_radius(self.SamplingRadius)
+
+        self._fig.canvas.draw_idle()
+        self._fig.canvas.flush_events()
+        self._last_draw = time.monotonic()
+
+    def add_node_to_index(self, node, parent_ind):
+        if self._n == len(self._xs):
+            capacity = 2 * len(self._xs)
+            self._xs = np.resize(self._xs, capacity)
+            self._ys = np.resize(self._ys, capacity)
+            self._parents = np.resize(self._parents, capacity)
+        self._xs[self._n] = node.x
+        self._ys[self._n] = node.y
+        self._parents[self._n] = parent_ind
+        self._n += 1
+
+        if self._rebuild is None and self._n - self._indexed_n >= self.rebuild_threshold:
+            # column_stack copies, so appends during the build are safe
+            node_xy = np.column_stack((self._xs[:self._n], self._ys[:self._n]))
+            self._rebuild = (_rebuild_executor.submit(cKDTree, node_xy), self._n)
+
+    def cancel_rebuild(self):
+        # drop a pending kd-tree rebuild; a build already running finishes
+        # on the worker but its result is discarded
+        if self._rebuild is not None:
+            self._rebuild[0].cancel()
+            self._rebuild = None
+
+    def get_nearest_node_index(self, rnd_node):
+        if self._rebuild is not None and self._rebuild[0].done():
+            future, indexed_n = self._rebuild
+            self._kdtree, self._indexed_n = future.result(), indexed_n
+            self._rebuild = None
+
+        minind, mind2 = -1, float("inf")
+        if self._kdtree is not None:
+            d, minind = self._kdtree.query((rnd_node.x, rnd_node.y), k=1)
+            mind2 = d * d
+
+        if self._indexed_n < self._n:
+            d2 = ((self._xs[self._indexed_n:self._n] - rnd_node.x) ** 2
+                  + (self._ys[self._indexed_n:self._n] - rnd_node.y) ** 2)
+            tailind = int(d2.argmin())
+            if d2[tailind] < mind2:
+                minind = self._indexed_n + tailind
+
+        return int(minind)
+
+    def check_collision(self, node):
 
         if node is None:
             return False
 
-        for (ox, oy, size) in obstacleList:
-            dx_list = [ox - x for x in node.path_x]
-            dy_list = [oy - y for y in node.path_y]
-            d_list = [dx * dx + dy * dy for (dx, dy) in zip(dx_list, dy_list)]
-
-            if min(d_list) <= (size+InflationRadius) ** 2:
-                return False  # collision
+        # every path point lies within half_len of the segment midpoint, so
+        # obstacles farther than half_len + r from it cannot be hit
+        px, py = node.path_x, node.path_y
+        mx = 0.5 * (px[0] + px[-1])
+        my = 0.5 * (py[0] + py[-1])
+        half_len = 0.5 * math.hypot(px[-1] - px[0], py[-1] - py[0])
+        for (ox, oy, r, r2) in self._obstacle_rows:
+            if (ox - mx) ** 2 + (oy - my) ** 2 > (half_len + r) ** 2:
+                continue
+            for (x, y) in zip(px, py):
+                if (ox - x) ** 2 + (oy - y) ** 2 <= r2:
+                    return False  # collision
 
         return True  # safe
 
     @staticmethod
-    def calc_distance_and_angle(from_node, to_node):
+    def calc_distance_and_direction(from_node, to_node):
         dx = to_node.x - from_node.x
         dy = to_node.y - from_node.y
         d = math.hypot(dx, dy)
-        theta = math.atan2(dy, dx)
-        return d, theta
+        if d == 0.0:
+            return d, 0.0, 0.0
+        return d, dx / d, dy / d
 
 
 def main(gx=6.0, gy=10.0):